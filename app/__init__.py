@@ -5,13 +5,22 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
-from config import config
+from flask_caching import Cache
+from config import get_config
 import os
 
+# Gemini AI for blog generation
+try:
+    from google import genai
+    GEMINI_AVAILABLE = True
+except ImportError:
+    GEMINI_AVAILABLE = False
+
 db = SQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
 csrf = CSRFProtect()
+cache = Cache()
 
 login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Please log in to access this page.'
@@ -24,13 +33,18 @@ def create_app(config_name=None):
         config_name = os.environ.get('FLASK_CONFIG', 'default')
     
     app = Flask(__name__)
-    app.config.from_object(config[config_name])
+    app.config.update(get_config(config_name))
     
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     csrf.init_app(app)
+    cache.init_app(app)
+    
+    # Build the Gemini client once so its HTTP connections are reused across requests
+    if GEMINI_AVAILABLE and app.config.get('GEMINI_API_KEY'):
+        app.extensions['gemini_client'] = genai.Client(api_key=app.config['GEMINI_API_KEY'])
     
     # Ensure upload folder exists
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -51,12 +65,27 @@ def create_app(config_name=None):
             'blog_author': app.config['BLOG_AUTHOR']
         }
     
-    # Create database tables
+    @app.cli.command('init-db')
+    def init_db():
+        """Create or upgrade database tables and the default admin user."""
+        bootstrap(app)
+    
+    if app.config.get('BOOTSTRAP_ON_START'):
+        bootstrap(app)
+    
+    return app
+
+
+def bootstrap(app):
+    """Create or upgrade database tables and the default admin user if missing."""
     with app.app_context():
         db.create_all()
         
+        # create_all() skips existing tables, so add anything newer releases introduced
+        from app.models import User, upgrade_schema
+        upgrade_schema()
+        
         # Create admin user if not exists
-        from app.models import User
         if not User.query.filter_by(username='admin').first():
             admin = User(
                 username='admin',
@@ -66,5 +95,3 @@ def create_app(config_name=None):
             admin.set_password('admin123')  # Change this!
             db.session.add(admin)
             db.session.commit()
-    
-    return app
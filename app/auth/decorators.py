@@ -0,0 +1,17 @@
+# Authentication Decorators
+
+from functools import wraps
+from flask import abort, current_app
+from flask_login import current_user
+
+
+def admin_required(func):
+    """Require a logged-in admin; anonymous users are sent to the login page."""
+    @wraps(func)
+    def decorated_view(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return current_app.login_manager.unauthorized()
+        if not current_user.is_admin:
+            abort(403)
+        return func(*args, **kwargs)
+    return decorated_view
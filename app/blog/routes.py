@@ -1,58 +1,111 @@
 # Blog Routes
 
-from flask import render_template, redirect, url_for, flash, request, current_app, abort, jsonify
+from flask import render_template, redirect, url_for, flash, request, current_app, abort, jsonify, \
+    Response, stream_with_context, session
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
+from sqlalchemy.orm import selectinload, lazyload, load_only, with_expression
 from datetime import datetime
+import json
 import os
+import shutil
 import uuid
 
+from app.auth.decorators import admin_required
 from app.blog import blog_bp
 from app.blog.forms import PostForm, SearchForm, AboutForm
-from app.models import Post, Tag, User, SiteSettings
-from app import db
+from app.models import Post, Tag, User, SiteSettings, post_tags
+from app import db, cache, GEMINI_AVAILABLE
 
-# Gemini AI for blog generation
-try:
-    from google import genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+# Structured output returned by a single generate_post request
+GENERATED_POST_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'title': {'type': 'STRING'},
+        'content': {'type': 'STRING'},
+        'excerpt': {'type': 'STRING'},
+        'tags': {'type': 'STRING'},
+    },
+    'required': ['title', 'content', 'excerpt', 'tags'],
+}
+
+# Marker rendered into cached post pages and replaced with the live view count per request
+VIEW_COUNT_SLOT = '<!--view-count-->'
 
 
 def allowed_file(filename):
-    """Check if file extension is allowed."""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+    """Return the match for an allowed file extension, or None."""
+    return current_app.config['ALLOWED_EXTENSIONS_RE'].search(filename)
 
 
 def save_image(file):
     """Save uploaded image and return filename."""
-    if file and allowed_file(file.filename):
+    match = allowed_file(file.filename) if file else None
+    if match:
         # Generate unique filename
-        ext = file.filename.rsplit('.', 1)[1].lower()
+        ext = match.group(1).lower()
         filename = f"{uuid.uuid4().hex}.{ext}"
         filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        # Copy in 64KB chunks so memory use doesn't grow with the upload size
+        with open(filepath, 'wb') as out:
+            shutil.copyfileobj(file.stream, out, length=64 * 1024)
         return filename
     return None
 
 
+def delete_image(filename):
+    """Delete an uploaded image, ignoring files that are already gone."""
+    try:
+        os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+    except FileNotFoundError:
+        pass
+
+
+def listing_options():
+    """Query options for post listings: skip the full content, load a short preview."""
+    return (
+        load_only(Post.id, Post.title, Post.slug, Post.excerpt, Post.cover_image,
+                  Post.published_at, Post.word_count),
+        with_expression(Post.content_preview, db.func.substr(Post.content, 1, 200)),
+    )
+
+
+def skip_page_cache():
+    """Bypass the page cache for logged-in users and pages showing flashed messages."""
+    return current_user.is_authenticated or '_flashes' in session
+
+
+def skip_post_page_cache():
+    """Also bypass the post page cache for query strings, which the page echoes back."""
+    return skip_page_cache() or bool(request.args)
+
+
+def clear_page_cache():
+    """Drop cached public pages after posts change."""
+    cache.clear()
+
+
+def sse_event(data):
+    """Format a dict as a server-sent event."""
+    return f"data: {json.dumps(data)}\n\n"
+
+
 # ==================== PUBLIC ROUTES ====================
 
 @blog_bp.route('/')
+@cache.cached(query_string=True, unless=skip_page_cache)
 def index():
     """Homepage with featured and recent posts."""
     page = request.args.get('page', 1, type=int)
     
     # Get featured post
-    featured_post = Post.query.filter_by(
+    featured_post = Post.query.options(*listing_options()).filter_by(
         is_published=True, 
         is_featured=True
     ).order_by(Post.published_at.desc()).first()
     
     # Get recent posts (excluding featured)
-    query = Post.query.filter_by(is_published=True)
+    query = Post.query.options(*listing_options(), selectinload(Post.tags)).filter_by(is_published=True)
     if featured_post:
         query = query.filter(Post.id != featured_post.id)
     
@@ -62,8 +115,10 @@ def index():
         error_out=False
     )
     
-    # Get popular tags
-    tags = Tag.query.join(Tag.posts).filter(Post.is_published == True).all()
+    # Get popular tags, most used first
+    tags = Tag.query.join(post_tags).join(Post).filter(
+        Post.is_published == True
+    ).group_by(Tag.id).order_by(db.func.count(post_tags.c.post_id).desc()).limit(20).all()
     
     return render_template('index.html', 
                           featured_post=featured_post,
@@ -75,24 +130,38 @@ def index():
 @blog_bp.route('/post/<slug>')
 def view_post(slug):
     """View individual blog post."""
-    post = Post.query.filter_by(slug=slug, is_published=True).first_or_404()
-    
-    # Increment view counter
-    post.increment_views()
-    
-    # Get related posts (same tags)
+    # Count the view on every request, even when the page itself is cached
+    views = Post.increment_views(slug)
+    if views is None:
+        abort(404)
+    # The cached page leaves a slot for the live view count, and is keyed by host for its share links
+    return render_post_page(slug, request.host).replace(VIEW_COUNT_SLOT, str(views), 1)
+
+
+@cache.memoize(unless=skip_post_page_cache)
+def render_post_page(slug, host):
+    """Render a published post with its related posts; host only keys the cache."""
+    post = Post.query.options(selectinload(Post.tags)).filter_by(
+        slug=slug, is_published=True
+    ).first_or_404()
+    
+    # Get related posts (same tags), joining post_tags directly
     related_posts = []
     if post.tags:
         tag_ids = [tag.id for tag in post.tags]
-        related_posts = Post.query.filter(
+        related_posts = Post.query.options(*listing_options(), lazyload(Post.tags)).join(
+            post_tags, post_tags.c.post_id == Post.id
+        ).filter(
+            post_tags.c.tag_id.in_(tag_ids),
             Post.is_published == True,
-            Post.id != post.id,
-            Post.tags.any(Tag.id.in_(tag_ids))
-        ).limit(3).all()
+            Post.id != post.id
+        ).distinct().order_by(Post.published_at.desc()).limit(3).all()
     
     return render_template('post.html', 
                           post=post,
                           related_posts=related_posts,
+                          view_count=VIEW_COUNT_SLOT,
+                          share_url=url_for('blog.view_post', slug=post.slug, _external=True),
                           title=post.title)
 
 
@@ -102,7 +171,7 @@ def posts_by_tag(slug):
     tag = Tag.query.filter_by(slug=slug).first_or_404()
     page = request.args.get('page', 1, type=int)
     
-    posts = Post.query.filter(
+    posts = Post.query.options(*listing_options()).filter(
         Post.is_published == True,
         Post.tags.contains(tag)
     ).order_by(Post.published_at.desc()).paginate(
@@ -124,9 +193,9 @@ def search():
     page = request.args.get('page', 1, type=int)
     
     if query:
-        posts = Post.query.filter(
+        posts = Post.query.options(*listing_options()).filter(
             Post.is_published == True,
-            (Post.title.ilike(f'%{query}%') | Post.content.ilike(f'%{query}%'))
+            Post.search_filter(query)
         ).order_by(Post.published_at.desc()).paginate(
             page=page,
             per_page=current_app.config['POSTS_PER_PAGE'],
@@ -145,26 +214,23 @@ def search():
 def about():
     """About page."""
     # Get editable content from settings
-    about_data = {
-        'about_title': SiteSettings.get('about_title', 'Welcome to my blog'),
-        'about_intro': SiteSettings.get('about_intro', 'Sharing thoughts, stories, and ideas with the world.'),
-        'about_content': SiteSettings.get('about_content', ''),
-        'twitter_url': SiteSettings.get('twitter_url', ''),
-        'github_url': SiteSettings.get('github_url', ''),
-        'linkedin_url': SiteSettings.get('linkedin_url', ''),
-    }
+    about_data = SiteSettings.get_many({
+        'about_title': 'Welcome to my blog',
+        'about_intro': 'Sharing thoughts, stories, and ideas with the world.',
+        'about_content': '',
+        'twitter_url': '',
+        'github_url': '',
+        'linkedin_url': '',
+    })
     return render_template('about.html', title='About', about=about_data)
 
 
 # ==================== ADMIN ROUTES ====================
 
 @blog_bp.route('/admin')
-@login_required
+@admin_required
 def admin_dashboard():
     """Admin dashboard."""
-    if not current_user.is_admin:
-        abort(403)
-    
     # Statistics
     total_posts = Post.query.count()
     published_posts = Post.query.filter_by(is_published=True).count()
@@ -172,7 +238,9 @@ def admin_dashboard():
     total_views = db.session.query(db.func.sum(Post.views)).scalar() or 0
     
     # Recent posts
-    recent_posts = Post.query.order_by(Post.created_at.desc()).limit(5).all()
+    recent_posts = Post.query.options(
+        load_only(Post.id, Post.title, Post.is_published, Post.created_at)
+    ).order_by(Post.created_at.desc()).limit(5).all()
     
     return render_template('admin/dashboard.html',
                           total_posts=total_posts,
@@ -184,16 +252,16 @@ def admin_dashboard():
 
 
 @blog_bp.route('/admin/posts')
-@login_required
+@admin_required
 def admin_posts():
     """List all posts for admin."""
-    if not current_user.is_admin:
-        abort(403)
-    
     page = request.args.get('page', 1, type=int)
     status = request.args.get('status', 'all')
     
-    query = Post.query
+    query = Post.query.options(load_only(
+        Post.id, Post.title, Post.slug, Post.is_published, Post.is_featured,
+        Post.views, Post.created_at
+    ))
     if status == 'published':
         query = query.filter_by(is_published=True)
     elif status == 'draft':
@@ -212,12 +280,9 @@ def admin_posts():
 
 
 @blog_bp.route('/admin/posts/new', methods=['GET', 'POST'])
-@login_required
+@admin_required
 def create_post():
     """Create new blog post."""
-    if not current_user.is_admin:
-        abort(403)
-    
     form = PostForm()
     
     if form.validate_on_submit():
@@ -241,10 +306,7 @@ def create_post():
         
         # Handle tags
         if form.tags.data:
-            tag_names = [t.strip() for t in form.tags.data.split(',') if t.strip()]
-            for tag_name in tag_names:
-                tag = Tag.get_or_create(tag_name)
-                post.tags.append(tag)
+            post.tags.extend(Tag.get_or_create_many(form.tags.data.split(',')))
         
         # Set published date
         if form.is_published.data:
@@ -252,6 +314,7 @@ def create_post():
         
         db.session.add(post)
         db.session.commit()
+        clear_page_cache()
         
         flash('Post created successfully!', 'success')
         return redirect(url_for('blog.admin_posts'))
@@ -263,12 +326,9 @@ def create_post():
 
 
 @blog_bp.route('/admin/posts/<int:id>/edit', methods=['GET', 'POST'])
-@login_required
+@admin_required
 def edit_post(id):
     """Edit existing blog post."""
-    if not current_user.is_admin:
-        abort(403)
-    
     post = Post.query.get_or_404(id)
     form = PostForm(obj=post)
     
@@ -290,20 +350,16 @@ def edit_post(id):
             if filename:
                 # Delete old image if exists
                 if post.cover_image:
-                    old_path = os.path.join(current_app.config['UPLOAD_FOLDER'], post.cover_image)
-                    if os.path.exists(old_path):
-                        os.remove(old_path)
+                    delete_image(post.cover_image)
                 post.cover_image = filename
         
         # Handle tags
         post.tags.clear()
         if form.tags.data:
-            tag_names = [t.strip() for t in form.tags.data.split(',') if t.strip()]
-            for tag_name in tag_names:
-                tag = Tag.get_or_create(tag_name)
-                post.tags.append(tag)
+            post.tags.extend(Tag.get_or_create_many(form.tags.data.split(',')))
         
         db.session.commit()
+        clear_page_cache()
         flash('Post updated successfully!', 'success')
         return redirect(url_for('blog.admin_posts'))
     
@@ -319,34 +375,27 @@ def edit_post(id):
 
 
 @blog_bp.route('/admin/posts/<int:id>/delete', methods=['POST'])
-@login_required
+@admin_required
 def delete_post(id):
     """Delete blog post."""
-    if not current_user.is_admin:
-        abort(403)
-    
     post = Post.query.get_or_404(id)
     
     # Delete cover image if exists
     if post.cover_image:
-        image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], post.cover_image)
-        if os.path.exists(image_path):
-            os.remove(image_path)
+        delete_image(post.cover_image)
     
     db.session.delete(post)
     db.session.commit()
+    clear_page_cache()
     
     flash('Post deleted successfully!', 'success')
     return redirect(url_for('blog.admin_posts'))
 
 
 @blog_bp.route('/admin/posts/<int:id>/toggle-publish', methods=['POST'])
-@login_required
+@admin_required
 def toggle_publish(id):
     """Toggle post publish status."""
-    if not current_user.is_admin:
-        abort(403)
-    
     post = Post.query.get_or_404(id)
     post.is_published = not post.is_published
     
@@ -354,6 +403,7 @@ def toggle_publish(id):
         post.published_at = datetime.utcnow()
     
     db.session.commit()
+    clear_page_cache()
     
     status = 'published' if post.is_published else 'unpublished'
     flash(f'Post {status} successfully!', 'success')
@@ -361,34 +411,38 @@ def toggle_publish(id):
 
 
 @blog_bp.route('/admin/about', methods=['GET', 'POST'])
-@login_required
+@admin_required
 def admin_about():
     """Edit About page content."""
-    if not current_user.is_admin:
-        abort(403)
-    
     form = AboutForm()
     
     if form.validate_on_submit():
-        # Save all settings
-        SiteSettings.set('about_title', form.about_title.data or '')
-        SiteSettings.set('about_intro', form.about_intro.data or '')
-        SiteSettings.set('about_content', form.about_content.data or '')
-        SiteSettings.set('twitter_url', form.twitter_url.data or '')
-        SiteSettings.set('github_url', form.github_url.data or '')
-        SiteSettings.set('linkedin_url', form.linkedin_url.data or '')
+        # Save all settings in one transaction
+        SiteSettings.set_many({
+            'about_title': form.about_title.data or '',
+            'about_intro': form.about_intro.data or '',
+            'about_content': form.about_content.data or '',
+            'twitter_url': form.twitter_url.data or '',
+            'github_url': form.github_url.data or '',
+            'linkedin_url': form.linkedin_url.data or '',
+        })
+        db.session.commit()
         
         flash('About page updated successfully!', 'success')
         return redirect(url_for('blog.admin_about'))
     
     # Pre-populate form with existing values
     if request.method == 'GET':
-        form.about_title.data = SiteSettings.get('about_title', '')
-        form.about_intro.data = SiteSettings.get('about_intro', '')
-        form.about_content.data = SiteSettings.get('about_content', '')
-        form.twitter_url.data = SiteSettings.get('twitter_url', '')
-        form.github_url.data = SiteSettings.get('github_url', '')
-        form.linkedin_url.data = SiteSettings.get('linkedin_url', '')
+        settings = SiteSettings.get_many({
+            'about_title': '', 'about_intro': '', 'about_content': '',
+            'twitter_url': '', 'github_url': '', 'linkedin_url': '',
+        })
+        form.about_title.data = settings['about_title']
+        form.about_intro.data = settings['about_intro']
+        form.about_content.data = settings['about_content']
+        form.twitter_url.data = settings['twitter_url']
+        form.github_url.data = settings['github_url']
+        form.linkedin_url.data = settings['linkedin_url']
     
     return render_template('admin/about_form.html',
                           form=form,
@@ -406,9 +460,9 @@ def generate_post():
     if not GEMINI_AVAILABLE:
         return jsonify({'error': 'Gemini AI library not installed'}), 500
     
-    # Get API key
-    api_key = current_app.config.get('GEMINI_API_KEY')
-    if not api_key:
+    # Get the client built at startup from GEMINI_API_KEY
+    client = current_app.extensions.get('gemini_client')
+    if client is None:
         return jsonify({'error': 'GEMINI_API_KEY not configured. Add it to your environment variables.'}), 400
     
     # Get prompt from request
@@ -418,12 +472,8 @@ def generate_post():
     if not prompt:
         return jsonify({'error': 'Please provide a topic or prompt'}), 400
     
-    try:
-        # Configure Gemini Client
-        client = genai.Client(api_key=api_key)
-        
-        # Create blog post prompt
-        blog_prompt = f"""Write a professional blog post about: {prompt}
+    # Ask for every field in one structured response
+    blog_prompt = f"""Write a professional blog post about: {prompt}
 
 Requirements:
 - Write in a clear, engaging, and informative style
@@ -434,46 +484,39 @@ Requirements:
 - Write in first person as a tech professional
 - Make it SEO-friendly with relevant keywords
 
-Return ONLY the blog content in markdown format, nothing else."""
-
-        # Generate content
-        response = client.models.generate_content(
-            model='gemini-2.5-flash', 
-            contents=blog_prompt
-        )
-        content = response.text
-        
-        # Generate title
-        title_prompt = f"Generate a catchy, SEO-friendly blog post title about: {prompt}. Return ONLY the title, nothing else."
-        title_response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=title_prompt
-        )
-        title = title_response.text.strip().strip('"')
-        
-        # Generate excerpt
-        excerpt_prompt = f"Write a 1-2 sentence summary/excerpt for a blog post about: {prompt}. Return ONLY the excerpt, nothing else."
-        excerpt_response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=excerpt_prompt
-        )
-        excerpt = excerpt_response.text.strip()
-        
-        # Generate tags
-        tags_prompt = f"Generate 3-5 relevant tags (single words or short phrases) for a blog post about: {prompt}. Return them comma-separated, nothing else."
-        tags_response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=tags_prompt
-        )
-        tags = tags_response.text.strip()
-        
-        return jsonify({
-            'success': True,
-            'title': title,
-            'content': content,
-            'excerpt': excerpt,
-            'tags': tags
-        })
-        
-    except Exception as e:
-        return jsonify({'error': f'AI generation failed: {str(e)}'}), 500
+Return a JSON object with these fields:
+- title: a catchy, SEO-friendly title
+- content: the blog content in markdown format
+- excerpt: a 1-2 sentence summary of the post
+- tags: 3-5 relevant tags (single words or short phrases), comma-separated"""
+    
+    def generate():
+        """Stream chunks as they arrive, then the parsed post as the final event."""
+        chunks = []
+        try:
+            for chunk in client.models.generate_content_stream(
+                model='gemini-2.5-flash',
+                contents=blog_prompt,
+                config={
+                    'response_mime_type': 'application/json',
+                    'response_schema': GENERATED_POST_SCHEMA
+                }
+            ):
+                if chunk.text:
+                    chunks.append(chunk.text)
+                    yield sse_event({'delta': chunk.text})
+            
+            generated = json.loads(''.join(chunks))
+            yield sse_event({
+                'success': True,
+                'title': generated['title'].strip().strip('"'),
+                'content': generated['content'],
+                'excerpt': generated['excerpt'].strip(),
+                'tags': generated['tags'].strip()
+            })
+        except Exception as e:
+            yield sse_event({'error': f'AI generation failed: {str(e)}'})
+    
+    return Response(stream_with_context(generate()),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
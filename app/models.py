@@ -3,11 +3,48 @@
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from flask import current_app
 from slugify import slugify
+from sqlalchemy.dialects import postgresql, sqlite
 import re
+import time
 from app import db, login_manager
 
 
+# Precompiled patterns for the plain-ASCII slug fast path
+_SLUG_SEPARATOR_RE = re.compile(r'[^a-z0-9]+')
+_NUMBER_COMMA_RE = re.compile(r'(?<=\d),(?=\d)')
+_WORD_RE = re.compile(r'\w+')
+
+
+def make_slug(text):
+    """Slugify text, skipping python-slugify's transliteration for plain ASCII."""
+    if not text.isascii() or '&' in text:
+        # Non-ASCII text and HTML entities need python-slugify's full pipeline
+        return slugify(text)
+    text = _NUMBER_COMMA_RE.sub('', text.lower())
+    return _SLUG_SEPARATOR_RE.sub('-', text).strip('-')
+
+
+def count_words(text):
+    """Number of words in text, as used for reading time."""
+    return len(_WORD_RE.findall(text or ''))
+
+
+def search_vector(title, content):
+    """PostgreSQL full-text search document for a post's title and content."""
+    return db.func.to_tsvector(
+        db.literal_column("'english'"),
+        db.func.coalesce(title, '') + ' ' + db.func.coalesce(content, '')
+    )
+
+
+def conflict_insert(model):
+    """Return an INSERT supporting ON CONFLICT clauses, or None if the database has none."""
+    insert = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}.get(db.engine.dialect.name)
+    return insert(model) if insert else None
+
+
 # Association table for posts and tags
 post_tags = db.Table('post_tags',
     db.Column('post_id', db.Integer, db.ForeignKey('posts.id'), primary_key=True),
@@ -60,44 +97,122 @@ class Post(db.Model):
     is_published = db.Column(db.Boolean, default=False)
     is_featured = db.Column(db.Boolean, default=False)
     views = db.Column(db.Integer, default=0)
+    word_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     published_at = db.Column(db.DateTime)
     
+    # Start of the content, loaded by listing queries instead of the full text
+    content_preview = db.query_expression()
+    
+    __table_args__ = (
+        # Public listings filter on published posts and order by publish date
+        db.Index('ix_posts_pub_pubat', 'is_published', 'published_at'),
+        db.Index('ix_posts_featured', 'is_published', 'is_featured', 'published_at'),
+        # GIN index for full-text search; other databases fall back to ILIKE
+        db.Index('ix_posts_search', search_vector(title, content),
+                 postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+    
     # Foreign keys
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
     # Relationships
-    tags = db.relationship('Tag', secondary=post_tags, lazy='subquery',
+    tags = db.relationship('Tag', secondary=post_tags, lazy='selectin',
                           backref=db.backref('posts', lazy='dynamic'))
     
     def generate_slug(self):
         """Generate URL-friendly slug from title."""
-        base_slug = slugify(self.title)
+        base_slug = make_slug(self.title)
+        # Fetch every taken slug with this prefix at once, then pick the first free suffix
+        existing = {row.slug for row in db.session.query(Post.slug).filter(
+            Post.slug.like(f'{base_slug}%')
+        )}
         slug = base_slug
         counter = 1
-        while Post.query.filter_by(slug=slug).first() is not None:
+        while slug in existing:
             slug = f"{base_slug}-{counter}"
             counter += 1
         self.slug = slug
     
+    def update_word_count(self):
+        """Store the content's word count for reading time."""
+        self.word_count = count_words(self.content)
+    
     @property
     def reading_time(self):
         """Calculate estimated reading time in minutes."""
         # Average reading speed: 200 words per minute
-        word_count = len(re.findall(r'\w+', self.content or ''))
-        minutes = max(1, round(word_count / 200))
+        minutes = max(1, round((self.word_count or 0) / 200))
         return minutes
     
-    def increment_views(self):
-        """Increment view counter."""
-        self.views = (self.views or 0) + 1
+    @staticmethod
+    def increment_views(slug):
+        """Increment a published post's view counter; returns the new count, or None if there is none."""
+        statement = (
+            db.update(Post)
+            .where(Post.slug == slug, Post.is_published == True)
+            .values(views=db.func.coalesce(Post.views, 0) + 1)
+        )
+        if db.engine.dialect.update_returning:
+            views = db.session.execute(statement.returning(Post.views)).scalar()
+        elif db.session.execute(statement).rowcount:
+            views = db.session.scalar(db.select(Post.views).where(Post.slug == slug))
+        else:
+            views = None
         db.session.commit()
+        return views
+    
+    @staticmethod
+    def search_filter(query):
+        """Build the search condition, using full-text search on PostgreSQL."""
+        if db.engine.dialect.name == 'postgresql':
+            return search_vector(Post.title, Post.content).op('@@')(db.func.plainto_tsquery('english', query))
+        return Post.title.ilike(f'%{query}%') | Post.content.ilike(f'%{query}%')
     
     def __repr__(self):
         return f'<Post {self.title}>'
 
 
+@db.event.listens_for(Post, 'before_insert')
+def post_before_insert(mapper, connection, target):
+    """Count words when a post is first saved."""
+    target.update_word_count()
+
+
+@db.event.listens_for(Post, 'before_update')
+def post_before_update(mapper, connection, target):
+    """Recount words only when the content changed."""
+    if db.inspect(target).attrs.content.history.has_changes():
+        target.update_word_count()
+
+
+def upgrade_schema():
+    """Bring tables created by an older release up to the current models."""
+    posts = Post.__table__
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns('posts')}
+    if 'word_count' not in columns:
+        db.session.execute(db.text('ALTER TABLE posts ADD COLUMN word_count INTEGER'))
+    
+    # Count words for posts saved before word_count existed
+    rows = db.session.execute(
+        db.select(posts.c.id, posts.c.content).where(posts.c.word_count.is_(None))
+    ).all()
+    if rows:
+        db.session.execute(
+            db.update(posts)
+            .where(posts.c.id == db.bindparam('post_id'))
+            # Setting updated_at to itself keeps its onupdate from touching every post
+            .values(word_count=db.bindparam('count'), updated_at=posts.c.updated_at),
+            [{'post_id': id, 'count': count_words(content)} for id, content in rows]
+        )
+    
+    # Create indexes added to the model since; checkfirst skips the ones that exist
+    for index in posts.indexes:
+        index.create(db.session.connection(), checkfirst=True)
+    db.session.commit()
+
+
 class Tag(db.Model):
     """Tag model for categorizing posts."""
     __tablename__ = 'tags'
@@ -107,18 +222,57 @@ class Tag(db.Model):
     slug = db.Column(db.String(50), unique=True, nullable=False, index=True)
     
     @staticmethod
-    def get_or_create(name):
-        """Get existing tag or create new one."""
-        tag = Tag.query.filter_by(name=name.lower().strip()).first()
-        if not tag:
-            tag = Tag(name=name.lower().strip(), slug=slugify(name))
-            db.session.add(tag)
-        return tag
+    def get_or_create_many(names):
+        """Get or create tags for a list of names with one lookup and one bulk insert."""
+        names = list(dict.fromkeys(name.lower().strip() for name in names if name.strip()))
+        if not names:
+            return []
+        tags = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(names))}
+        missing = [name for name in names if name not in tags]
+        if missing:
+            rows = [{'name': name, 'slug': slug} for name, slug in zip(missing, Tag._unique_slugs(missing))]
+            insert = conflict_insert(Tag)
+            if insert is not None:
+                # A concurrent request may have added the same name; the re-select picks it up
+                db.session.execute(insert.values(rows).on_conflict_do_nothing(index_elements=['name']))
+                tags.update((tag.name, tag) for tag in Tag.query.filter(Tag.name.in_(missing)))
+            else:
+                for row in rows:
+                    tag = Tag(**row)
+                    db.session.add(tag)
+                    tags[tag.name] = tag
+        return [tags[name] for name in names]
+    
+    @staticmethod
+    def _unique_slugs(names):
+        """Slugs for new tag names, suffixed where they collide with existing tags or each other."""
+        base_slugs = [make_slug(name) for name in names]
+        # Fetch every taken slug with one of these prefixes at once, as Post.generate_slug does
+        taken = {row.slug for row in db.session.query(Tag.slug).filter(
+            db.or_(*(Tag.slug.like(f'{base_slug}%') for base_slug in set(base_slugs)))
+        )}
+        slugs = []
+        for base_slug in base_slugs:
+            slug = base_slug
+            counter = 1
+            while slug in taken:
+                slug = f"{base_slug}-{counter}"
+                counter += 1
+            taken.add(slug)
+            slugs.append(slug)
+        return slugs
     
     def __repr__(self):
         return f'<Tag {self.name}>'
 
 
+# In-process cache of all site settings, refreshed after SETTINGS_CACHE_TTL seconds
+_settings_cache = {}
+_cache_loaded_at = None
+# Bumped on every invalidation so a load that raced with a commit is not cached
+_cache_generation = 0
+
+
 class SiteSettings(db.Model):
     """Site settings for editable content like About page."""
     __tablename__ = 'site_settings'
@@ -128,24 +282,84 @@ class SiteSettings(db.Model):
     value = db.Column(db.Text)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    @staticmethod
+    def _load():
+        """Load all settings in one query and cache them until the TTL expires."""
+        global _settings_cache, _cache_loaded_at
+        now = time.monotonic()
+        ttl = current_app.config.get('SETTINGS_CACHE_TTL', 60)
+        if _cache_loaded_at is None or now - _cache_loaded_at > ttl:
+            generation = _cache_generation
+            settings = dict(db.session.execute(db.select(SiteSettings.key, SiteSettings.value)).all())
+            if generation != _cache_generation:
+                # Settings were committed while loading; serve these rows but don't cache them
+                return settings
+            # Swap in a new dict so other threads never see a half-filled cache
+            _settings_cache, _cache_loaded_at = settings, now
+        return _settings_cache
+    
     @staticmethod
     def get(key, default=None):
         """Get setting value by key."""
-        setting = SiteSettings.query.filter_by(key=key).first()
-        return setting.value if setting else default
+        settings = SiteSettings._load()
+        return settings[key] if key in settings else default
+    
+    @staticmethod
+    def get_many(defaults):
+        """Get several settings at once as a dict, given a mapping of key to default."""
+        settings = SiteSettings._load()
+        return {key: settings[key] if key in settings else default
+                for key, default in defaults.items()}
+    
+    @staticmethod
+    def _invalidate():
+        """Reload the cache from the database on the next read."""
+        global _cache_loaded_at, _cache_generation
+        _cache_generation += 1
+        _cache_loaded_at = None
     
     @staticmethod
     def set(key, value):
-        """Set setting value by key."""
+        """Set setting value by key; the caller commits, which refreshes the cache."""
         setting = SiteSettings.query.filter_by(key=key).first()
         if setting:
             setting.value = value
         else:
             setting = SiteSettings(key=key, value=value)
             db.session.add(setting)
-        db.session.commit()
+        db.session.info['site_settings_changed'] = True
         return setting
     
+    @staticmethod
+    def set_many(values):
+        """Upsert several settings in one statement; the caller commits, which refreshes the cache."""
+        insert = conflict_insert(SiteSettings)
+        if insert is None:
+            for key, value in values.items():
+                SiteSettings.set(key, value)
+            return
+        now = datetime.utcnow()
+        insert = insert.values([
+            {'key': key, 'value': value, 'updated_at': now} for key, value in values.items()
+        ])
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=['key'],
+            set_={'value': insert.excluded.value, 'updated_at': insert.excluded.updated_at}
+        ))
+        db.session.info['site_settings_changed'] = True
+    
     def __repr__(self):
         return f'<SiteSettings {self.key}>'
 
+
+@db.event.listens_for(db.session, 'after_commit')
+def settings_after_commit(session):
+    """Drop cached settings once changes to them are committed, not before."""
+    if session.info.pop('site_settings_changed', False):
+        SiteSettings._invalidate()
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def settings_after_rollback(session):
+    """Forget pending settings changes that were rolled back."""
+    session.info.pop('site_settings_changed', None)
@@ -1,67 +1,175 @@
 # Blog Platform Configuration
 
+import functools
 import os
-from datetime import timedelta
+import re
+import sys
+import types
 
-basedir = os.path.abspath(os.path.dirname(__file__))
+basedir = sys.intern(os.path.abspath(os.path.dirname(__file__)))
+
+# Lifetime of permanent sessions in seconds (7 days); Flask converts it to a timedelta
+_SESSION_LIFETIME = 7 * 24 * 60 * 60
+
+# Environment variables already read, by name
+_ENV_CACHE = {}
+_UNSET = object()  # Cached for variables that are not set
+
+
+# Security settings for production, merged in one update by get_config()
+_PROD_COOKIE_DEFAULTS = {
+    'SESSION_COOKIE_SECURE': False,  # Set to True if using HTTPS
+    'SESSION_COOKIE_HTTPONLY': True,
+    'SESSION_COOKIE_SAMESITE': 'Lax',
+}
+
+# Settings overridden by the environment variable of the same name; the classes hold the defaults
+_ENV_OVERRIDES = ('SECRET_KEY', 'BLOG_TITLE', 'BLOG_SUBTITLE', 'BLOG_AUTHOR', 'GEMINI_API_KEY')
+
+
+def _env(name, default=None):
+    """Read an environment variable once and serve repeat reads from the cache."""
+    if name not in _ENV_CACHE:
+        # Cache only the raw lookup so each caller's default still applies
+        _ENV_CACHE[name] = os.environ.get(name, _UNSET)
+    value = _ENV_CACHE[name]
+    return default if value is _UNSET else value
+
+
+def _env_int(name, default):
+    """Read an integer environment variable, falling back to default when it is unset or empty."""
+    value = (_env(name) or '').strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a whole number, got {value!r}') from None
+
+
+@functools.cache
+def data_dir():
+    """Directory for the SQLite database, checked on first use."""
+    # Docker mounts a volume at /app/data; elsewhere fall back to the project root
+    try:
+        os.stat('/app/data')
+    except OSError:
+        return basedir
+    return '/app/data'
+
+
+def _sqlite_uri(directory):
+    """URI of the blog's SQLite database file inside directory."""
+    return sys.intern(f'sqlite:///{directory}/blog.db')
 
 
 class Config:
     """Base configuration."""
-    SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-super-secret-key-change-in-production'
+    __slots__ = ()  # Settings are class attributes; instances need no __dict__
+    SECRET_KEY = 'your-super-secret-key-change-in-production'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+    }
     
     # Session configuration
-    PERMANENT_SESSION_LIFETIME = timedelta(days=7)
+    PERMANENT_SESSION_LIFETIME = _SESSION_LIFETIME
     
     # Upload configuration
-    UPLOAD_FOLDER = os.path.join(basedir, 'app', 'static', 'uploads')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    UPLOAD_FOLDER = sys.intern(os.path.join(basedir, 'app', 'static', 'uploads'))  # Created once by create_app
+    MAX_CONTENT_LENGTH = _env_int('MAX_UPLOAD_MB', 16) << 20  # MB -> bytes, 16MB by default
+    ALLOWED_EXTENSIONS = frozenset(('png', 'jpg', 'jpeg', 'gif', 'webp'))
+    # Matches an allowed extension at the end of a filename, in any case
+    ALLOWED_EXTENSIONS_RE = re.compile(r'\.(%s)$' % '|'.join(sorted(ALLOWED_EXTENSIONS)), re.IGNORECASE)
     
     # Pagination
     POSTS_PER_PAGE = 10
     
+    # Create tables and the default admin when the app starts (otherwise run `flask init-db`)
+    BOOTSTRAP_ON_START = False
+    
+    # Public page cache: shared Redis when REDIS_URL is set, otherwise per-process memory
+    CACHE_REDIS_URL = _env('REDIS_URL')
+    CACHE_TYPE = 'RedisCache' if CACHE_REDIS_URL else 'SimpleCache'
+    CACHE_DEFAULT_TIMEOUT = 60
+    
+    # Seconds before cached site settings are re-read from the database
+    SETTINGS_CACHE_TTL = 60
+    
     # Blog settings
-    BLOG_TITLE = os.environ.get('BLOG_TITLE') or 'AGIBLOG'
-    BLOG_SUBTITLE = os.environ.get('BLOG_SUBTITLE') or 'Thoughts, stories and ideas'
-    BLOG_AUTHOR = os.environ.get('BLOG_AUTHOR') or 'Mirkamol Rahimov'
+    BLOG_TITLE = 'AGIBLOG'
+    BLOG_SUBTITLE = 'Thoughts, stories and ideas'
+    BLOG_AUTHOR = 'Mirkamol Rahimov'
     
     # AI Generation (Gemini)
-    GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY') or ''
+    GEMINI_API_KEY = ''
+    
+    @classmethod
+    def get_db_uri(cls):
+        """SQLite database in the project root - simple like Django!"""
+        return _sqlite_uri(basedir)
 
 
 class DevelopmentConfig(Config):
     """Development configuration."""
+    __slots__ = ()
     DEBUG = True
-    # Always use SQLite - simple like Django!
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'blog.db')
+    BOOTSTRAP_ON_START = True
 
 
 class ProductionConfig(Config):
     """Production configuration."""
+    __slots__ = ()
     DEBUG = False
-    # SQLite database - works in Docker with volume mount at /app/data
-    # Falls back to local blog.db if /app/data doesn't exist
-    DATA_DIR = '/app/data' if os.path.exists('/app/data') else basedir
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(DATA_DIR, 'blog.db')
     
-    # Security settings for production
-    SESSION_COOKIE_SECURE = False  # Set to True if using HTTPS
-    SESSION_COOKIE_HTTPONLY = True
-    SESSION_COOKIE_SAMESITE = 'Lax'
+    @classmethod
+    def get_db_uri(cls):
+        """SQLite database in the data directory, only probed when production is selected."""
+        return _sqlite_uri(data_dir())
 
 
 class TestingConfig(Config):
     """Testing configuration."""
+    __slots__ = ()
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    BOOTSTRAP_ON_START = True
+    # In-memory SQLite uses a single static connection, which takes no pool sizing
+    SQLALCHEMY_ENGINE_OPTIONS = {}
     WTF_CSRF_ENABLED = False
+    CACHE_TYPE = 'NullCache'
+    
+    @classmethod
+    def get_db_uri(cls):
+        """Throwaway in-memory database."""
+        return 'sqlite:///:memory:'
 
 
-config = {
+config_classes = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
     'testing': TestingConfig,
     'default': DevelopmentConfig
 }
+
+
+@functools.cache
+def get_config(name='default'):
+    """Flatten a named configuration, database URI included, into a read-only mapping."""
+    config_class = config_classes[name]
+    settings = {key: getattr(config_class, key) for key in dir(config_class) if key.isupper()}
+    if issubclass(config_class, ProductionConfig):
+        settings.update(_PROD_COOKIE_DEFAULTS)
+    for key in _ENV_OVERRIDES:
+        settings[key] = _env(key, settings[key])
+    settings['SQLALCHEMY_DATABASE_URI'] = config_class.get_db_uri()
+    # The result is memoised and shared by every app, so callers must not mutate it
+    return types.MappingProxyType(settings)
+
+
+def reload_config():
+    """Forget cached environment reads so the next get_config() picks up new values."""
+    _ENV_CACHE.clear()
+    get_config.cache_clear()
@@ -0,0 +1,7 @@
+# Gunicorn Configuration (loaded automatically from the working directory)
+
+import os
+
+# Threaded workers let each process overlap requests that are waiting on the database
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))